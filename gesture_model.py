@@ -1,7 +1,8 @@
 import os # Library for interacting with the file system.
 import numpy as np # Library for manipulating numerical data (arrays).
-import tensorflow as tf # TensorFlow library for building and training neural networks.
-from tensorflow.keras import layers, models # Import layers and models from Keras, which is part of TensorFlow.
+
+# List of desired gestures to be loaded, in label order (the index of each gesture is its label).
+GESTURES = ['Play', 'Pause', 'Next', 'Previous', 'Volume Up', 'Volume Down', 'Victory', 'Thumb Up', 'Rock and Roll']
 
 # Function for loading gesture data.
 def load_gesture_data():
@@ -10,22 +11,18 @@ def load_gesture_data():
         print(f"Error: The folder '{gestures_dir}' does not exists.")  # Error message if the folder does not exist.
         return None, None, None  # Returns None value if the folder does not exist.
 
-    # List of desired gestures to be loaded.
-    desired_gestures = ['Play', 'Pause', 'Next', 'Previous', 'Volume Up', 'Volume Down', 'Victory', 'Thumb Up',
-                        'Rock and Roll']
-
     images = []  # List to store gesture images/landmarks.
     labels = []  # List to store tags associated with gestures.
     gestures = []  # List to store the actual gestures (their names).
 
     # Iterates through each desired gesture and load the corresponding .npy files.
-    for label, gesture in enumerate(desired_gestures):
+    for label, gesture in enumerate(GESTURES):
         gesture_dir = os.path.join(gestures_dir, gesture)  # Creates the folder path for each gesture.
         if not os.path.isdir(gesture_dir):  # Checks if the directory for the gesture exists.
             print(f"Warning: Folder for gesture '{gesture}' does not exist.")  # Displays a warning if it doesn't exist.
             continue  # Go to the next gesture if the directory does not exist.
 
-        gesture_files = os.listdir(gesture_dir)  # Lists the files in the current gesture directory.
+        gesture_files = sorted(os.listdir(gesture_dir))  # Lists the files in the current gesture directory (sorted, so the split is reproducible).
         if not gesture_files:  # Checks for files in the directory.
             print(f"Warning: No files found for gesture '{gesture}'.")  # Displays a warning if there are no files.
             continue  # Go to the next gesture if there are no files.
@@ -49,8 +46,25 @@ def load_gesture_data():
 
     return images, labels, gestures  # Returns images, tags, and gestures.
 
+# Function for splitting the gesture data into a training part and a held-out test part.
+def split_gesture_data(images, labels, test_fraction=0.2, seed=42):
+    rng = np.random.default_rng(seed)  # Seeded random generator, so every run produces the same split.
+    test_mask = np.zeros(len(labels), dtype=bool)  # Marks which samples belong to the held-out part.
+
+    # Takes the same fraction from every gesture, so each class is represented in the held-out part.
+    for label in np.unique(labels):
+        indices = np.flatnonzero(labels == label)  # Indices of all samples of the current gesture.
+        rng.shuffle(indices)  # Shuffles them so the held-out samples are not just the last recorded ones.
+        test_mask[indices[:int(round(len(indices) * test_fraction))]] = True  # Marks the first part as held-out.
+
+    # Returns the training images and labels followed by the held-out images and labels.
+    return images[~test_mask], labels[~test_mask], images[test_mask], labels[test_mask]
+
 # The function for training the gesture recognition model.
 def train_model():
+    # TensorFlow is imported here, so the data functions above (used by model_evaluation.py) do not require it.
+    from tensorflow.keras import layers, models # Import layers and models from Keras, which is part of TensorFlow.
+
     images, labels, gestures = load_gesture_data()  # Loads gesture data.
     if images is None or labels is None or gestures is None:  # Checks if the data has been loaded correctly.
         print("Model training failed due to missing data.")  # Displays a message if data is missing.
@@ -80,8 +94,11 @@ def train_model():
     # Displays the model architecture summary.
     model.summary()
 
-    # Trains the model using the loaded data.
-    model.fit(images, labels, epochs=50, validation_split=0.2, batch_size=32)  # Training on 50 epochs with 20% validation data and batch-size of 32.
+    # Keeps 20% of every gesture aside; model_evaluation.py evaluates models trained here on the same split.
+    train_images, train_labels, test_images, test_labels = split_gesture_data(images, labels)
+
+    # Trains the model using the training part of the data.
+    model.fit(train_images, train_labels, epochs=50, validation_data=(test_images, test_labels), batch_size=32)  # Training on 50 epochs with the held-out data for validation and batch-size of 32.
 
     # Saves the trained model to a .h5 file.
     model.save("gesture_model.h5")  # Saves the model to an h5 file.
@@ -0,0 +1,382 @@
+import os  # Library for interacting with the file system.
+import sys  # Library for setting the exit code of the script.
+import json  # Library for reading and writing the JSON baseline.
+import hashlib  # Library for fingerprinting the held-out data.
+import time  # Time management library, used for measuring latency.
+import platform  # Library for describing the machine the benchmark ran on.
+import argparse  # Library for parsing the command line arguments.
+import numpy as np  # Library for manipulating numerical data (arrays).
+from gesture_model import GESTURES, load_gesture_data, split_gesture_data  # Gesture data loading and the shared train/test split.
+
+# The confidence thresholds evaluated for accepting a gesture (music_player.py currently uses 0.8).
+THRESHOLDS = [0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+
+# A gesture recognized less often than this is reported as suspicious (e.g. the model outputs are in a different order).
+MIN_SANE_RECALL = 0.1
+
+# Exit code for configuration errors (unusable model, baseline or options); 1 is reserved for regressions.
+ERROR_EXIT_CODE = 2
+
+# Function for stopping the command because of a configuration error.
+def exit_with_error(message):
+    print(f"Error: {message}")
+    raise SystemExit(ERROR_EXIT_CODE)
+
+# Function for loading a model artifact and returning a function that predicts a batch of landmarks.
+def load_predictor(model_path):
+    extension = os.path.splitext(model_path)[1].lower()  # The file extension decides which runtime is used.
+    if not os.path.isfile(model_path):  # Checks that the model file exists before loading it.
+        exit_with_error(f"The model file '{model_path}' does not exist.")
+
+    if extension in ('.h5', '.keras'):
+        try:
+            import tensorflow as tf  # TensorFlow is only needed for Keras models.
+        except ImportError:
+            exit_with_error("Evaluating an .h5 or .keras model requires the 'tensorflow' package.")
+        try:
+            model = tf.keras.models.load_model(model_path)  # Loads the Keras model.
+        except Exception as error:  # Keras raises different exception types for unreadable files.
+            exit_with_error(f"Could not load the model '{model_path}': {error}")
+
+        # Calls the model directly, which avoids the per-call overhead of model.predict().
+        def predict(batch):
+            return model(batch, training=False).numpy()
+        return predict
+
+    if extension == '.onnx':
+        try:
+            import onnxruntime as ort  # ONNX Runtime is only needed for ONNX models.
+        except ImportError:
+            exit_with_error("Evaluating an .onnx model requires the 'onnxruntime' package.")
+        try:
+            session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])  # Creates a CPU inference session.
+        except Exception as error:  # ONNX Runtime raises its own exception types for invalid files.
+            exit_with_error(f"Could not load the model '{model_path}': {error}")
+        input_meta = session.get_inputs()[0]  # The description of the model input.
+        input_name = input_meta.name  # The name of the model input.
+        fixed_batch = input_meta.shape[0] if isinstance(input_meta.shape[0], int) else None  # Set if the batch size is fixed in the graph.
+
+        def predict(batch):
+            batch = batch.astype(np.float32)  # ONNX Runtime expects float32 input.
+            if fixed_batch is None or fixed_batch == len(batch):
+                return session.run(None, {input_name: batch})[0]  # Runs the whole batch at once.
+            # The exported graph has a fixed batch size, so the batch is run in chunks of that size.
+            outputs = []
+            for i in range(0, len(batch), fixed_batch):
+                chunk = batch[i:i + fixed_batch]
+                padding = fixed_batch - len(chunk)  # The last chunk is padded with zeros up to the fixed size.
+                if padding:
+                    chunk = np.concatenate([chunk, np.zeros((padding, batch.shape[1]), dtype=np.float32)])
+                outputs.append(session.run(None, {input_name: chunk})[0][:fixed_batch - padding])  # Drops the padded rows.
+            return np.concatenate(outputs)
+        return predict
+
+    exit_with_error(f"Unsupported model format '{extension}' (expected .h5, .keras or .onnx).")
+
+# Function for running the predictor over all samples in batches.
+def predict_in_batches(predict, images, batch_size):
+    images = images.astype(np.float32)  # Uses the same data type as the recognizer does at runtime.
+    return np.concatenate([predict(images[i:i + batch_size]) for i in range(0, len(images), batch_size)])
+
+# Function for building the confusion matrix (rows are the true gestures, columns are the predicted gestures).
+def confusion_matrix(labels, predicted, num_classes):
+    return np.bincount(labels * num_classes + predicted, minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+# Function for computing the precision, recall and F1 score of every gesture from the confusion matrix.
+def per_class_metrics(matrix, gesture_names):
+    true_positives = np.diag(matrix).astype(float)  # Correct predictions for every gesture.
+    predicted_counts = matrix.sum(axis=0)  # How many times every gesture was predicted.
+    actual_counts = matrix.sum(axis=1)  # How many samples of every gesture exist.
+    precision = np.divide(true_positives, predicted_counts, out=np.zeros_like(true_positives), where=predicted_counts > 0)
+    recall = np.divide(true_positives, actual_counts, out=np.zeros_like(true_positives), where=actual_counts > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(true_positives), where=(precision + recall) > 0)
+
+    return {name: {'precision': float(precision[i]), 'recall': float(recall[i]), 'f1': float(f1[i]),
+                   'support': int(actual_counts[i])}
+            for i, name in enumerate(gesture_names)}
+
+# Function for computing the calibration curve (how often the model is right at each confidence level).
+def calibration_curve(confidences, correct, num_bins=10):
+    bins = []  # List to store the statistics of every confidence bin.
+    expected_error = 0.0  # Expected calibration error, weighted by the number of samples in each bin.
+    bin_index = np.minimum((confidences * num_bins).astype(int), num_bins - 1)  # The bin of every sample.
+
+    for b in range(num_bins):
+        in_bin = bin_index == b  # Samples whose confidence falls into the current bin.
+        count = int(in_bin.sum())
+        if count == 0:  # Skips empty bins.
+            continue
+        mean_confidence = float(confidences[in_bin].mean())
+        accuracy = float(correct[in_bin].mean())
+        expected_error += count / len(confidences) * abs(accuracy - mean_confidence)
+        bins.append({'lower': b / num_bins, 'upper': (b + 1) / num_bins, 'count': count,
+                     'mean_confidence': mean_confidence, 'accuracy': accuracy})
+
+    return bins, float(expected_error)
+
+# Function for showing what each confidence threshold would accept and how accurate the accepted gestures are.
+def threshold_sweep(confidences, correct, thresholds=THRESHOLDS):
+    sweep = []  # List to store the statistics of every threshold.
+    for threshold in thresholds:
+        accepted = confidences > threshold  # The same comparison the music player uses.
+        sweep.append({'threshold': threshold,
+                      'coverage': float(accepted.mean()),  # Fraction of gestures that would trigger a command.
+                      'accuracy': float(correct[accepted].mean()) if accepted.any() else None})  # How many of them are right.
+    return sweep
+
+# Function for measuring the prediction latency for single samples and for whole batches.
+def measure_latency(predict, images, batch_size, runs=200, warmup=10):
+    images = images.astype(np.float32)
+
+    # Times the predictor on the given inputs and returns the durations in milliseconds.
+    def time_calls(inputs):
+        for sample in inputs[:warmup]:  # Warm-up calls are not measured (lazy initialization, caches).
+            predict(sample)
+        durations = []
+        for sample in inputs:
+            start = time.perf_counter()
+            predict(sample)
+            durations.append((time.perf_counter() - start) * 1000)
+        return np.array(durations)
+
+    # Single samples, reshaped like in gesture_recognizer.py (1 row and all coordinates).
+    single = time_calls([images[i % len(images)].reshape(1, -1) for i in range(runs)])
+    # Full batches taken from the start of the data (repeated if the data is smaller than one batch).
+    batch = np.resize(images, (batch_size, images.shape[1]))
+    batched = time_calls([batch] * max(runs // 10, 5))
+
+    return {'single_sample_ms': {'mean': float(single.mean()), 'p50': float(np.percentile(single, 50)),
+                                 'p95': float(np.percentile(single, 95))},
+            'batch_ms': {'batch_size': batch_size, 'mean': float(batched.mean()), 'p50': float(np.percentile(batched, 50)),
+                         'per_sample': float(np.percentile(batched, 50) / batch_size)}}
+
+# Function for evaluating a model on the held-out part of the gesture data.
+def evaluate_model(model_path, images, labels, batch_size=256, latency_runs=200):
+    predict = load_predictor(model_path)  # Loads the model.
+
+    probabilities = predict_in_batches(predict, images, batch_size)  # Predicts all held-out samples.
+    predicted = np.argmax(probabilities, axis=1)  # The gesture with the highest probability.
+    confidences = np.max(probabilities, axis=1)  # The confidence of that gesture.
+    correct = predicted == labels  # Which predictions are right.
+
+    # The model outputs must correspond one to one to the gestures, in the order of GESTURES.
+    num_classes = probabilities.shape[1]  # The number of gestures the model can output.
+    if num_classes != len(GESTURES) or labels.max() >= num_classes:
+        exit_with_error(f"Model '{model_path}' has {num_classes} outputs, but {len(GESTURES)} gestures "
+                         f"({', '.join(GESTURES)}) are expected in this order.")
+    matrix = confusion_matrix(labels, predicted, num_classes)
+    classes = per_class_metrics(matrix, GESTURES)
+    calibration, expected_error = calibration_curve(confidences, correct)
+
+    # Warns about gestures the model (almost) never recognizes, which usually means the labels do not match.
+    for name, metrics in classes.items():
+        if metrics['support'] > 0 and metrics['recall'] < MIN_SANE_RECALL:
+            print(f"Warning: Model '{model_path}' recognizes only {metrics['recall']:.1%} of '{name}' samples; "
+                  f"check that the model outputs follow the order of GESTURES before using it as a baseline.")
+
+    return {'model': model_path,
+            'samples': int(len(labels)),
+            'accuracy': float(correct.mean()),
+            'macro_f1': float(np.mean([c['f1'] for c in classes.values()])),
+            'per_class': classes,
+            'confusion_matrix': {'labels': GESTURES, 'matrix': matrix.tolist()},
+            'calibration': {'expected_calibration_error': expected_error, 'bins': calibration},
+            'thresholds': threshold_sweep(confidences, correct),
+            'latency': measure_latency(predict, images, batch_size, latency_runs)}
+
+# Function for normalizing a model path, so differently spelled paths of the same file match.
+def model_key(model_path):
+    return os.path.normcase(os.path.normpath(model_path))
+
+# Function for fingerprinting the held-out data, so a baseline is only compared on exactly the same samples.
+def data_fingerprint(images, labels):
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(images, dtype=np.float32).tobytes())  # The landmarks of every sample.
+    digest.update(np.ascontiguousarray(labels, dtype=np.int64).tobytes())  # The label of every sample.
+    return digest.hexdigest()
+
+# Function for checking that a baseline has every field the comparison needs; returns the list of problems found.
+def validate_baseline(baseline):
+    if not isinstance(baseline, dict) or not isinstance(baseline.get('dataset'), dict) \
+            or not isinstance(baseline.get('models'), list):
+        return ["the baseline must contain a 'dataset' object and a 'models' list"]
+
+    problems = []  # List to store the description of every missing field.
+    for index, entry in enumerate(baseline['models']):
+        if not isinstance(entry, dict):
+            problems.append(f"models[{index}] is not an object")
+            continue
+        latency = entry.get('latency') if isinstance(entry.get('latency'), dict) else {}
+        required = {'model': entry.get('model'),
+                    'accuracy': entry.get('accuracy'),
+                    'per_class': entry.get('per_class') if isinstance(entry.get('per_class'), dict) else None,
+                    'latency.single_sample_ms.p50': (latency.get('single_sample_ms') or {}).get('p50'),
+                    'latency.batch_ms.per_sample': (latency.get('batch_ms') or {}).get('per_sample')}
+        problems.extend(f"models[{index}] has no '{field}'" for field, value in required.items() if value is None)
+    return problems
+
+# Function for finding the baseline entry of a model (by normalized path, then by file name if that is unique).
+def find_baseline_entry(model_path, baseline):
+    entries = baseline['models']
+    matches = [entry for entry in entries if model_key(entry['model']) == model_key(model_path)]
+    if not matches:
+        matches = [entry for entry in entries
+                   if os.path.basename(model_key(entry['model'])) == os.path.basename(model_key(model_path))]
+    return matches[0] if len(matches) == 1 else None
+
+# Function for comparing the results with a saved baseline; returns the list of regressions found.
+def find_regressions(results, baseline, max_accuracy_drop=0.01, max_latency_increase=0.5, reference_model=None,
+                     allow_new_models=False):
+    regressions = []  # List to store the description of every regression.
+
+    for result in results['models']:
+        # Compares with the explicitly named baseline entry, or with the entry of the same model file.
+        reference = find_baseline_entry(reference_model or result['model'], baseline)
+        if reference is None:  # A model without a baseline cannot be checked, which fails the gate unless allowed.
+            message = f"{result['model']}: no baseline entry for '{reference_model or result['model']}'"
+            if allow_new_models:
+                print(f"Warning: {message}.")
+            else:
+                regressions.append(message)
+            continue
+
+        # Accuracy and per-class recall may not drop by more than the allowed amount.
+        if result['accuracy'] < reference['accuracy'] - max_accuracy_drop:
+            regressions.append(f"{result['model']}: accuracy {result['accuracy']:.4f} < baseline {reference['accuracy']:.4f}")
+        for name, metrics in result['per_class'].items():
+            reference_recall = reference['per_class'].get(name, {}).get('recall')
+            if reference_recall is not None and metrics['recall'] < reference_recall - max_accuracy_drop:
+                regressions.append(f"{result['model']}: recall of '{name}' {metrics['recall']:.4f} < baseline {reference_recall:.4f}")
+
+        # The median latencies may not grow by more than the allowed fraction.
+        for key, current, previous in (('single-sample', result['latency']['single_sample_ms']['p50'],
+                                        reference['latency']['single_sample_ms']['p50']),
+                                       ('batched', result['latency']['batch_ms']['per_sample'],
+                                        reference['latency']['batch_ms']['per_sample'])):
+            if current > previous * (1 + max_latency_increase):
+                regressions.append(f"{result['model']}: {key} latency {current:.4f} ms > baseline {previous:.4f} ms")
+
+    return regressions
+
+# Function for printing a short human-readable report of one model.
+def print_report(result):
+    print(f"\n=== {result['model']} ({result['samples']} held-out samples) ===")
+    print(f"Accuracy: {result['accuracy']:.4f}  Macro F1: {result['macro_f1']:.4f}")
+    print(f"{'Gesture':<15}{'Precision':>10}{'Recall':>10}{'F1':>10}{'Support':>10}")
+    for name, metrics in result['per_class'].items():
+        print(f"{name:<15}{metrics['precision']:>10.4f}{metrics['recall']:>10.4f}{metrics['f1']:>10.4f}{metrics['support']:>10}")
+
+    # Prints the confusion matrix with the gesture indices as column headers.
+    print("\nConfusion matrix (rows: true, columns: predicted):")
+    names = result['confusion_matrix']['labels']
+    print(' ' * 18 + ''.join(f"{index:>6}" for index in range(len(names))))
+    for index, (name, row) in enumerate(zip(names, result['confusion_matrix']['matrix'])):
+        print(f"{index:>2} {name:<15}" + ''.join(f"{value:>6}" for value in row))
+
+    # Prints the calibration curve: how often the model is right for each range of confidence.
+    print(f"\nCalibration curve (expected calibration error: {result['calibration']['expected_calibration_error']:.4f}):")
+    print(f"{'Confidence':>12}{'Count':>8}{'Mean conf':>11}{'Accuracy':>10}")
+    for entry in result['calibration']['bins']:
+        print(f"{entry['lower']:>6.1f}-{entry['upper']:<5.1f}{entry['count']:>8}{entry['mean_confidence']:>11.4f}{entry['accuracy']:>10.4f}")
+
+    print()
+    print(f"{'Threshold':>10}{'Coverage':>10}{'Accuracy':>10}")
+    for entry in result['thresholds']:
+        accuracy = f"{entry['accuracy']:.4f}" if entry['accuracy'] is not None else '-'
+        print(f"{entry['threshold']:>10.2f}{entry['coverage']:>10.4f}{accuracy:>10}")
+
+    latency = result['latency']
+    print(f"\nSingle-sample latency: p50 {latency['single_sample_ms']['p50']:.3f} ms, p95 {latency['single_sample_ms']['p95']:.3f} ms")
+    print(f"Batched latency (batch of {latency['batch_ms']['batch_size']}): p50 {latency['batch_ms']['p50']:.3f} ms, "
+          f"{latency['batch_ms']['per_sample']:.4f} ms per sample")
+
+# The main function of the evaluation command.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluates gesture models on the held-out gesture data.")
+    parser.add_argument('models', nargs='*', default=['gesture_model.h5'], help="Model files to evaluate (.h5, .keras or .onnx).")
+    parser.add_argument('--output', help="Writes the results to this JSON file (use it to create a new baseline).")
+    parser.add_argument('--baseline', help="Compares the results with this JSON baseline and fails on regressions.")
+    parser.add_argument('--reference', help="Compares every model with this model's baseline entry instead of its own.")
+    parser.add_argument('--allow-new-models', action='store_true', help="Only warns about models without a baseline entry.")
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01, help="Allowed drop of accuracy and per-class recall.")
+    parser.add_argument('--max-latency-increase', type=float, default=0.5, help="Allowed relative increase of the median latency.")
+    parser.add_argument('--batch-size', type=int, default=256, help="Batch size for the batched predictions.")
+    parser.add_argument('--test-fraction', type=float, default=0.2, help="Fraction of every gesture held out for testing.")
+    parser.add_argument('--seed', type=int, default=42, help="Seed of the train/test split.")
+    parser.add_argument('--latency-runs', type=int, default=200, help="Number of timed single-sample predictions.")
+    args = parser.parse_args(argv)
+    if args.output and args.baseline and os.path.abspath(args.output) == os.path.abspath(args.baseline):
+        parser.error("--output and --baseline must be different files.")  # Otherwise the run would be compared with itself.
+    if args.reference and not args.baseline:
+        parser.error("--reference requires --baseline.")
+    if not 0 < args.test_fraction < 1:
+        parser.error("--test-fraction must be between 0 and 1 (exclusive).")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1.")
+    if args.latency_runs < 1:
+        parser.error("--latency-runs must be at least 1.")
+    missing = [model_path for model_path in args.models if not os.path.isfile(model_path)]
+    if missing:  # Checks all model files up front, so a missing one does not abort a run halfway.
+        parser.error(f"model file(s) not found: {', '.join(missing)}")
+
+    baseline = None  # The baseline is loaded and checked before any (slow) evaluation is done.
+    if args.baseline:
+        try:
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        except (OSError, json.JSONDecodeError) as error:  # A missing or broken baseline is a configuration error.
+            print(f"Error: The baseline '{args.baseline}' could not be read: {error}")
+            return ERROR_EXIT_CODE
+        problems = validate_baseline(baseline)
+        if problems:
+            print(f"Error: The baseline '{args.baseline}' is not usable: {'; '.join(problems)}.")
+            return ERROR_EXIT_CODE
+        if args.reference and find_baseline_entry(args.reference, baseline) is None:
+            print(f"Error: The baseline '{args.baseline}' has no entry for the reference model '{args.reference}'.")
+            return ERROR_EXIT_CODE
+
+    images, labels, gestures = load_gesture_data()  # Loads gesture data.
+    if images is None:  # Checks if the data has been loaded correctly.
+        print("Model evaluation failed due to missing data.")
+        return ERROR_EXIT_CODE
+    _, _, test_images, test_labels = split_gesture_data(images, labels, args.test_fraction, args.seed)  # Keeps only the held-out part.
+    if len(test_labels) == 0:  # Checks if the split left any samples to evaluate.
+        print(f"Error: --test-fraction {args.test_fraction} leaves no held-out samples.")
+        return ERROR_EXIT_CODE
+
+    dataset = {'test_fraction': args.test_fraction, 'seed': args.seed, 'samples': int(len(test_labels)),
+               'fingerprint': data_fingerprint(test_images, test_labels)}
+    # Metrics measured on different samples cannot be compared, so a different split is an error.
+    if baseline is not None and baseline['dataset'] != dataset:
+        print(f"Error: The baseline '{args.baseline}' was created on different held-out data "
+              f"(baseline: {baseline['dataset']}, current: {dataset}). Create a new baseline with --output.")
+        return ERROR_EXIT_CODE
+
+    results = {'dataset': dataset,
+               'environment': {'platform': platform.platform(), 'processor': platform.processor(),
+                               'python': platform.python_version()},
+               'models': []}
+    for model_path in args.models:
+        result = evaluate_model(model_path, test_images, test_labels, args.batch_size, args.latency_runs)
+        print_report(result)
+        results['models'].append(result)
+
+    if args.output:  # Saves the results, e.g. as the new baseline.
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"\nResults saved to '{args.output}'.")
+
+    if baseline is not None:  # Compares the results with the baseline.
+        regressions = find_regressions(results, baseline, args.max_accuracy_drop, args.max_latency_increase,
+                                       args.reference, args.allow_new_models)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+        print("No regressions compared to the baseline.")
+
+    return 0
+
+# Checks if this script is run directly.
+if __name__ == "__main__":
+    sys.exit(main())  # Runs the evaluation and sets the exit code (1 if a regression was found, 2 if the baseline is unusable).